@@ -0,0 +1,64 @@
+import argparse
+import sys
+import time
+
+from .game.state import GameState
+from .game.move import move_to_uci
+from .game import ai
+from .game.tt import TranspositionTable, SharedTranspositionTable
+from .perft import POSITIONS
+
+
+# searches one position to a fixed depth from a cold table and history; with workers > 1
+# as a Lazy SMP search or, with split, by root splitting. Node counts cover every process
+def bench_fen(fen, depth, options=None, hash_mb=16, workers=1, split=False):
+    gs = GameState()
+    gs.load_fen(fen)
+    color = 'white' if gs.white_to_move else 'black'
+    start = time.perf_counter()
+    if workers > 1 and split:
+        mv, search = ai.root_split(gs, color, float('inf'), depth, workers, TranspositionTable(hash_mb),
+                                   [0] * 4096, options, hash_mb, cold=True)
+    elif workers > 1:
+        tt = SharedTranspositionTable(hash_mb)
+        try:
+            mv, search = ai.lazy_smp(gs, color, float('inf'), depth, workers, tt, [0] * 4096, options)
+        finally:
+            tt.close()
+    else:
+        mv, search = ai.iterative_deepening(gs, color, float('inf'), depth, TranspositionTable(hash_mb),
+                                            [0] * 4096, options)
+    return mv, search, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Search the perft positions to a fixed depth and report nodes and speed.')
+    parser.add_argument('--depth', type=int, default=5, help='search depth (default: 5)')
+    parser.add_argument('--fen', help='run a single position instead of the standard suite')
+    parser.add_argument('--hash', type=int, default=16, help='transposition table size in MB')
+    parser.add_argument('--workers', type=int, default=1, help='search with this many processes (Lazy SMP)')
+    parser.add_argument('--split', action='store_true', help='with --workers, split the root moves instead')
+    for name in ai.SELECTIVE:
+        parser.add_argument('--no-' + name.replace('_', '-'), dest=name, action='store_false',
+                            help=f'turn off {name.replace("_", " ")}')
+    args = parser.parse_args(argv)
+    options = {name: getattr(args, name) for name in ai.SELECTIVE}
+
+    positions = [('fen', args.fen, [])] if args.fen else POSITIONS
+    total_nodes = total_time = 0
+    for name, fen, _ in positions:
+        mv, search, elapsed = bench_fen(fen, args.depth, options, args.hash, args.workers, args.split)
+        total_nodes += search.nodes
+        total_time += elapsed
+        nps = search.nodes / elapsed if elapsed else 0
+        best = move_to_uci(mv) if mv is not None else '-'
+        print(f"{name:10} depth {search.depth}  nodes {search.nodes:>9}  {elapsed:7.2f}s  {nps:>7.0f} nps"
+              f"  best {best:6} score {search.score:+.2f}")
+    off = [name for name, on in options.items() if not on]
+    print(f"{'total':10} nodes {total_nodes:>9}  {total_time:7.2f}s  "
+          f"{total_nodes / total_time if total_time else 0:>7.0f} nps  off: {', '.join(off) or 'none'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
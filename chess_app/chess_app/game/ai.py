@@ -1,88 +1,502 @@
-import random, math
-from copy import deepcopy
+import random, math, time, atexit
+from concurrent.futures import ProcessPoolExecutor, wait
 from .state import GameState
-from .utils import PIECE_VALUE
+from .bitboard import popcount
+from .pst import PHASE_TOTAL
+from .tt import TranspositionTable, SharedTranspositionTable, EXACT, LOWER, UPPER
+from .move import CAPTURE, PROMOTION, NULL_MOVE, is_capture, promotion_piece, move_to
 
+# shared by every hard-level search so results carry over between moves
+TT = TranspositionTable()
+
+HARD_MOVETIME_MS = 1000  # per-move budget when no clock is given
+MOVE_OVERHEAD_MS = 50    # kept in reserve so a clocked move never flags
+HELPER_GRACE_MS = 10     # how long past the deadline a Lazy SMP helper's result is awaited
+MAX_DEPTH = 64
+QS_MAX_PLY = 8        # captures searched past the horizon before falling back to the static score
+DELTA_MARGIN = 2      # pawns; a capture that can't lift the score this close to alpha/beta is skipped
+MIN_WINDOW = 0.01     # one centipawn, the finest step between two scores; the zero-window width
+ASPIRATION_WINDOW = 0.5   # pawns either side of the previous iteration's score
+ASPIRATION_MAX = 4        # once the widening step reaches this, the failing side is opened fully
+ASPIRATION_MIN_DEPTH = 3
+NULL_MOVE_R = 2           # plies the null-move search is reduced by, one more from depth 6
+NULL_MOVE_MIN_DEPTH = 2
+FUTILITY_MARGIN = (1, 3)  # pawns, at one and two plies from the horizon
+LMR_MIN_INDEX = 3         # moves searched at full depth before reductions start
+LMR_MIN_DEPTH = 3
+NOISY_BITS = (CAPTURE | PROMOTION) << 12
+
+# the selective techniques, each switchable per search (see Search and bench.py)
+SELECTIVE = {'null_move': True, 'lmr': True, 'futility': True, 'check_extension': True}
+SELECTIVE_OFF = dict.fromkeys(SELECTIVE, False)
+
+class SearchTimeout(Exception):
+    pass
+
+# butterfly history: how often a quiet from -> to move caused a cutoff, indexed by the
+# move's low 12 bits (from | to << 6);
+# it outlives a single search and is halved before each new one
+HISTORY = [0] * 4096
+
+# the last hard-level search, kept so its node count and ordering statistics can be inspected
+last_search = None
+
+class Search:
+    # state shared by every node of one search: the table, the wall-clock deadline,
+    # the move-ordering heuristics and counters showing how well the ordering works
+    def __init__(self, tt=None, deadline=None, history=None, options=None):
+        self.tt = tt
+        self.deadline = deadline
+        # SELECTIVE with any of its switches overridden
+        self.options = dict(SELECTIVE, **(options or {}))
+        self.history = history if history is not None else [0] * 4096
+        self.killers = [[0, 0] for _ in range(MAX_DEPTH + 1)]
+        # reusable move buffers per ply, quiescence plies included: captures, then quiets.
+        # Lists rather than arrays, so each can be sorted in place
+        self.buffers = [[] for _ in range(MAX_DEPTH + QS_MAX_PLY + 2)]
+        self.quiet_buffers = [[] for _ in range(MAX_DEPTH + 1)]
+        # the last completed iteration: its depth, score for the side to move and principal variation
+        self.depth = 0
+        self.score = None
+        self.pv = []
+        self.nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def record_cutoff(self, mv, depth, ply, index):
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        if is_capture(mv):
+            return
+        killers = self.killers[ply]
+        if killers[0] != mv:
+            killers[1] = killers[0]
+            killers[0] = mv
+        self.history[mv & 0xFFF] += depth * depth
+
+    def visit(self):
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes & 15 and time.monotonic() >= self.deadline:
+            raise SearchTimeout()
+
+# material and piece-square terms are running totals on the GameState, blended between
+# middlegame and endgame by phase; mobility counts the squares each side attacks
 def evaluate_board(gs: GameState):
-    score = 0
-    for r in range(8):
-        for c in range(8):
-            p = gs.board[r][c]
-            if p is None: continue
-            v = PIECE_VALUE.get(p.lower(), 0)
-            if p.isupper(): score += v
-            else: score -= v
-    w_moves = len(gs.generate_legal_moves('white'))
-    b_moves = len(gs.generate_legal_moves('black'))
-    score += 0.05 * (w_moves - b_moves)
-    return score
-
-def minimax(gs: GameState, depth, alpha, beta, maximizing):
-    if depth == 0:
-        return evaluate_board(gs), None
-    color = 'white' if maximizing else 'black'
-    moves = gs.generate_legal_moves(color)
-    if not moves:
-        in_check = gs.is_in_check(color)
-        if in_check:
-            return (-9999 if maximizing else 9999), None
-        return 0, None
-    best_move = None
-    if maximizing:
-        max_eval = -math.inf
-        for mv in moves:
-            r,c,nr,nc = mv
-            child = deepcopy(gs)
-            moving_piece = child.board[r][c]
-            promo = None
-            if moving_piece and moving_piece.lower() == 'p':
-                if moving_piece.isupper() and nr == 7: promo = 'Q'
-                if moving_piece.islower() and nr == 0: promo = 'q'
-            child.make_move(r,c,nr,nc,promotion_choice=promo)
-            val, _ = minimax(child, depth-1, alpha, beta, False)
-            if val > max_eval:
-                max_eval = val; best_move = mv
-            alpha = max(alpha, val)
-            if beta <= alpha: break
-        return max_eval, best_move
+    phase = min(gs.phase, PHASE_TOTAL)
+    score = (gs.mg * phase + gs.eg * (PHASE_TOTAL - phase)) // PHASE_TOTAL
+    white, black = gs.occ['white'], gs.occ['black']
+    occupied = white | black
+    w_moves = popcount(gs.attack_map('white', gs.pieces, occupied) & ~white)
+    b_moves = popcount(gs.attack_map('black', gs.pieces, occupied) & ~black)
+    return score / 100 + 0.05 * (w_moves - b_moves)
+
+def age_history(history):
+    for i in range(4096):
+        history[i] >>= 1
+
+# resolves captures at the horizon so a leaf is never scored halfway through an exchange;
+# like negamax, scores are from the point of view of color, the side to move
+def quiescence(gs: GameState, alpha, beta, color, search=None, qply=0):
+    if search is not None:
+        search.visit()
+    stand_pat = evaluate_board(gs) if color == 'white' else -evaluate_board(gs)
+    if qply >= QS_MAX_PLY or stand_pat >= beta:
+        return stand_pat
+    alpha = max(alpha, stand_pat)
+    best = stand_pat
+    buf = search.buffers[MAX_DEPTH + 1 + qply] if search is not None else []
+    captures = gs.generate_moves(buf, color, captures_only=True)
+    enemy = 'black' if color == 'white' else 'white'
+    captures.sort(key=gs.mvv_lva, reverse=True)
+    for mv in captures:
+        if stand_pat + gs.captured_value(mv) + DELTA_MARGIN <= alpha: continue
+        # a capture that loses the exchange can't improve on standing pat
+        if gs.is_losing_capture(mv): continue
+        gs.push(mv)
+        val = -quiescence(gs, -beta, -alpha, enemy, search, qply+1)
+        gs.pop()
+        best = max(best, val)
+        alpha = max(alpha, val)
+        if alpha >= beta: break
+    return best
+
+# negamax principal-variation search: scores are from the point of view of color, the side
+# to move. The first move gets the full (alpha, beta) window; the rest are tried with a
+# zero window around alpha and searched again in full only if they beat it. pv, when
+# given, is filled with the principal variation from this node. The selective techniques
+# (see SELECTIVE) only run with a search object.
+def negamax(gs: GameState, depth, alpha, beta, color, search=None, ply=0, pv=None):
+    tt = None
+    options = SELECTIVE_OFF
+    if search is not None:
+        search.visit()
+        tt = search.tt
+        options = search.options
+    # a repetition inside the tree is scored as a draw at once; the root must still pick a move
+    if ply and (gs.is_fifty_move_draw() or gs.repetition_count(stop_at=1) or gs.is_insufficient_material()):
+        return 0
+    in_check = gs.is_in_check(color)
+    # a check is searched one ply deeper, so the reply is never cut off by the horizon
+    if in_check and options['check_extension']:
+        depth += 1
+    if depth <= 0 or ply >= MAX_DEPTH:
+        return quiescence(gs, alpha, beta, color, search)
+    # zero-window nodes are proving a bound and may be pruned; the width test allows for float noise
+    pv_node = beta - alpha > 2 * MIN_WINDOW
+    alpha_orig = alpha
+    tt_move = 0
+    if tt is not None:
+        entry = tt.probe(gs.hash)
+        if entry is not None:
+            tt_depth, tt_score, tt_flag, tt_move = entry
+            tt_move = tt_move or 0
+            # only off the principal variation: a cutoff there would leave pv unfilled, and
+            # never at the root, which must produce a move
+            if tt_depth >= depth and ply and not pv_node:
+                if tt_flag == EXACT or (tt_flag == LOWER and tt_score >= beta) or (tt_flag == UPPER and tt_score <= alpha):
+                    return tt_score
+    enemy = 'black' if color == 'white' else 'white'
+    static = None
+    if not pv_node and not in_check:
+        static = evaluate_board(gs) if color == 'white' else -evaluate_board(gs)
+        # null move: if passing still fails high, a real move will too. Skipped without
+        # pieces besides pawns, where having to move can be what loses (zugzwang), and
+        # straight after another null move
+        white = color == 'white'
+        pieces = gs.occ[color] ^ gs.pieces['P' if white else 'p'] ^ gs.pieces['K' if white else 'k']
+        if (options['null_move'] and depth >= NULL_MOVE_MIN_DEPTH and static >= beta and pieces
+                and gs.move_history and gs.move_history[-1][0] != NULL_MOVE):
+            gs.push_null()
+            val = -negamax(gs, depth - 1 - (NULL_MOVE_R + (depth >= 6)), -beta, -beta + MIN_WINDOW,
+                           enemy, search, ply+1)
+            gs.pop_null()
+            if val >= beta:
+                # a mate found after passing is not a proven one
+                return beta if val >= 9999 else val
+    # futility: this close to the horizon, quiet moves that can't lift the static score
+    # to alpha are not searched
+    futile = (options['futility'] and static is not None and depth <= len(FUTILITY_MARGIN)
+              and static + FUTILITY_MARGIN[depth - 1] <= alpha)
+    if search is not None:
+        moves = gs.staged_moves(tt_move, search.killers[ply], search.history, color,
+                                search.buffers[ply], search.quiet_buffers[ply])
     else:
-        min_eval = math.inf
-        for mv in moves:
-            r,c,nr,nc = mv
-            child = deepcopy(gs)
-            moving_piece = child.board[r][c]
-            promo = None
-            if moving_piece and moving_piece.lower() == 'p':
-                if moving_piece.isupper() and nr == 7: promo = 'Q'
-                if moving_piece.islower() and nr == 0: promo = 'q'
-            child.make_move(r,c,nr,nc,promotion_choice=promo)
-            val, _ = minimax(child, depth-1, alpha, beta, True)
-            if val < min_eval:
-                min_eval = val; best_move = mv
-            beta = min(beta, val)
-            if beta <= alpha: break
-        return min_eval, best_move
-
-def ai_choose_move(gs: GameState, level='easy', side='black'):
-    moves = gs.generate_legal_moves(side)
-    if not moves: return None
+        moves = gs.generate_moves(None, color)
+    lmr = options['lmr'] and depth >= LMR_MIN_DEPTH and not in_check
+    child_pv = [] if pv is not None else None
+    best, best_move = -math.inf, None
+    i = 0
+    for mv in moves:
+        # only quiet moves after the first may be pruned or reduced, and never one that gives check
+        reducible = i and not mv & NOISY_BITS and (futile or (lmr and i >= LMR_MIN_INDEX))
+        gs.push(mv)
+        if reducible and gs.is_in_check(enemy):
+            reducible = False
+        if reducible and futile:
+            gs.pop()
+            best = max(best, static + FUTILITY_MARGIN[depth - 1])
+            continue
+        if child_pv is not None: del child_pv[:]
+        if i == 0:
+            val = -negamax(gs, depth-1, -beta, -alpha, enemy, search, ply+1, child_pv)
+        else:
+            # late-move reduction: quiet moves ordered late are searched shallower first
+            # and only at full depth if they still beat alpha
+            reduction = (1 if i < 2 * LMR_MIN_INDEX else 2) if reducible else 0
+            val = -negamax(gs, depth-1-reduction, -alpha - MIN_WINDOW, -alpha, enemy, search, ply+1, child_pv)
+            if reduction and val > alpha:
+                val = -negamax(gs, depth-1, -alpha - MIN_WINDOW, -alpha, enemy, search, ply+1, child_pv)
+            if alpha < val < beta:
+                if child_pv is not None: del child_pv[:]
+                val = -negamax(gs, depth-1, -beta, -alpha, enemy, search, ply+1, child_pv)
+        gs.pop()
+        if val > best:
+            best, best_move = val, mv
+        if val > alpha:
+            alpha = val
+            if pv is not None:
+                pv[:] = [mv]
+                pv += child_pv
+        if alpha >= beta:
+            if search is not None: search.record_cutoff(mv, depth, ply, i)
+            break
+        i += 1
+    if best_move is None:
+        # the staged generator produced nothing: checkmate or stalemate
+        return -9999 if in_check else 0
+    if tt is not None:
+        flag = UPPER if best <= alpha_orig else LOWER if best >= beta else EXACT
+        tt.store(gs.hash, depth, best, flag, best_move)
+    return best
+
+def time_budget_ms(movetime_ms=None, clock_ms=None, increment_ms=0):
+    if movetime_ms is not None:
+        return movetime_ms
+    if clock_ms is not None:
+        return max(1, min(clock_ms - MOVE_OVERHEAD_MS, clock_ms / 30 + increment_ms * 0.8))
+    return HARD_MOVETIME_MS
+
+# each iteration after the first is searched in a window around the previous score,
+# widened on whichever side the result falls outside it
+# deadline, when given, is an absolute time.monotonic() that replaces start + budget_ms,
+# so processes started later still stop when the caller does; skip is a Lazy SMP helper's
+# (size, phase) depth-skip pattern (see depth_skip)
+def iterative_deepening(gs: GameState, color, budget_ms, max_depth=MAX_DEPTH, tt=None, history=None,
+                        options=None, skip=None, deadline=None):
+    start = time.monotonic()
+    if deadline is None:
+        deadline = start + budget_ms / 1000
+    search = Search(tt, deadline, history, options)
+    # the search plays moves on its own copy, so a timeout mid-tree leaves gs untouched
+    root = gs.copy()
+    for depth in range(1, max_depth + 1):
+        if skip and (depth + skip[1]) // skip[0] % 2 and depth < max_depth:
+            continue
+        delta = ASPIRATION_WINDOW
+        if depth < ASPIRATION_MIN_DEPTH or search.score is None:
+            alpha, beta = -math.inf, math.inf
+        else:
+            alpha, beta = search.score - delta, search.score + delta
+        pv = []
+        try:
+            # the table hands each iteration the previous one's best moves to search first
+            while True:
+                del pv[:]
+                score = negamax(root, depth, alpha, beta, color, search, 0, pv)
+                if score <= alpha:
+                    alpha = score - delta if delta < ASPIRATION_MAX else -math.inf
+                elif score >= beta:
+                    beta = score + delta if delta < ASPIRATION_MAX else math.inf
+                else:
+                    break
+                delta *= 2
+        except SearchTimeout:
+            break
+        search.score, search.pv, search.depth = score, pv, depth
+        if abs(score) >= 9999:
+            break
+        # the next iteration costs several times this one, so don't start what can't finish
+        if time.monotonic() > (start + deadline) / 2:
+            break
+    return (search.pv[0] if search.pv else None), search
+
+# Lazy SMP: helper processes search the same root as this one, each skipping depths in
+# its own pattern (depth_skip), and meet only through the shared table, where each finds
+# the others' results to cut its own tree short. The deepest completed iteration wins,
+# this process's on a tie.
+# Everything shares one deadline, and helpers that have not answered by then (say, a pool
+# still starting up) are left out rather than waited for.
+def lazy_smp(gs: GameState, color, budget_ms, max_depth, workers, tt, history=None, options=None):
+    deadline = time.monotonic() + budget_ms / 1000
+    root = gs.copy()
+    pool = worker_pool(workers - 1)
+    jobs = [pool.submit(smp_worker, root, color, deadline, max_depth, tt.name, tt.size_mb, tt.generation,
+                        options, depth_skip(k))
+            for k in range(workers - 1)]
+    mv, search = iterative_deepening(root, color, budget_ms, max_depth, tt, history, options, deadline=deadline)
+    timeout = None if deadline == math.inf else max(0, deadline - time.monotonic()) + HELPER_GRACE_MS / 1000
+    done, _ = wait(jobs, timeout)
+    for job in jobs:
+        if job not in done:
+            job.cancel()
+            continue
+        depth, score, pv, nodes = job.result()
+        search.nodes += nodes
+        if depth > search.depth and pv:
+            search.depth, search.score, search.pv = depth, score, pv
+    return (search.pv[0] if search.pv else None), search
+
+# root splitting: each iteration searches the first root move here to get a bound, then
+# hands every other root move to the pool as a FEN plus its hash. A job only has to show
+# its move beats that bound (a zero-window search) and scores it exactly if it does.
+# Results are merged by score and then root order, so completion order never matters.
+# Every job carries this call's id so a pool process ages its own table and history once
+# per search, or with cold starts them empty as the caller's tt and history are.
+def root_split(gs: GameState, color, budget_ms, max_depth, workers, tt=None, history=None, options=None,
+               hash_mb=16, cold=False):
+    global SPLIT_ID
+    SPLIT_ID += 1
+    start = time.monotonic()
+    deadline = start + budget_ms / 1000
+    search = Search(tt, deadline, history, options)
+    pool = worker_pool(workers)
+    root = gs.copy()
+    enemy = 'black' if color == 'white' else 'white'
+    moves = list(root.staged_moves(0, (), None, color))
+    for depth in range(1, max_depth + 1):
+        if not moves:
+            break
+        try:
+            pv = []
+            root.push(moves[0])
+            alpha = -negamax(root, depth - 1, -math.inf, math.inf, enemy, search, 1, pv)
+            root.pop()
+        except SearchTimeout:
+            break
+        jobs = []
+        for mv in moves[1:]:
+            root.push(mv)
+            jobs.append(pool.submit(split_worker, root.to_fen(), root.hash, enemy, depth - 1, alpha, deadline, options,
+                                    hash_mb, SPLIT_ID, cold))
+            root.pop()
+        results = [(alpha, 0, [moves[0]] + pv)]
+        complete = True
+        for i, job in enumerate(jobs, 1):
+            score, child_pv, nodes = job.result()
+            search.nodes += nodes
+            if score is None:
+                complete = False
+            else:
+                results.append((score, i, [moves[i]] + child_pv))
+        if not complete:
+            break
+        score, index, pv = max(results, key=lambda r: (r[0], -r[1]))
+        search.score, search.pv, search.depth = score, pv, depth
+        # the next iteration starts from this one's best move
+        moves.insert(0, moves.pop(index))
+        if abs(score) >= 9999:
+            break
+        if (time.monotonic() - start) * 1000 > budget_ms / 2:
+            break
+    return (search.pv[0] if search.pv else None), search
+
+# root_split calls made from this process, and the last one a job was seen from (pool side)
+SPLIT_ID = 0
+WORKER_SPLIT_ID = None
+
+# one root_split job, searched in a pool process with that process's own table and
+# history; the score is from the root side's point of view, None on timeout
+def split_worker(fen, key, color, depth, alpha, deadline, options, hash_mb, split_id, cold):
+    global WORKER_SPLIT_ID
+    if split_id != WORKER_SPLIT_ID:
+        WORKER_SPLIT_ID = split_id
+        if cold:
+            TT.resize(hash_mb)
+            HISTORY[:] = [0] * 4096
+        else:
+            if TT.size_mb != hash_mb:
+                TT.resize(hash_mb)
+            TT.new_search()
+            age_history(HISTORY)
+    gs = GameState()
+    gs.load_fen(fen)
+    if gs.hash != key:
+        raise ValueError(f'position does not match its hash: {fen}')
+    search = Search(TT, deadline, HISTORY, options)
+    pv = []
+    try:
+        score = -negamax(gs, depth, -alpha - MIN_WINDOW, -alpha, color, search, 1, pv)
+        if score > alpha:
+            del pv[:]
+            score = -negamax(gs, depth, -math.inf, -alpha, color, search, 1, pv)
+    except SearchTimeout:
+        return None, [], search.nodes
+    return score, pv, search.nodes
+
+# (size, phase) of helper index's depth-skip pattern: a helper skips depth d when
+# (d + phase) // size is odd. Helpers 0-1 skip every other depth, 2-5 pairs of depths,
+# 6-11 runs of three and so on, each group at all its phases, so however many there are
+# they spread over different depths instead of repeating the main search
+def depth_skip(index):
+    size = 1
+    while index >= 2 * size:
+        index -= 2 * size
+        size += 1
+    return size, index
+
+# tables attached in this process, by shared-memory name (helper side of lazy_smp)
+ATTACHED_TT = {}
+
+def smp_worker(gs, color, deadline, max_depth, tt_name, hash_mb, generation, options, skip):
+    tt = ATTACHED_TT.get(tt_name)
+    if tt is None:
+        for old in ATTACHED_TT.values():
+            old.close()
+        ATTACHED_TT.clear()
+        tt = ATTACHED_TT[tt_name] = SharedTranspositionTable(hash_mb, tt_name)
+    tt.generation = generation
+    mv, search = iterative_deepening(gs, color, None, max_depth, tt, None, options, skip, deadline)
+    return search.depth, search.score, search.pv, search.nodes
+
+# the multi-process searches keep one table and one pool of helper processes alive
+# between moves, so neither is rebuilt every turn; root_split jobs also keep each pool
+# process's own TT and HISTORY warm
+SHARED_TT = None
+POOL = None
+POOL_SIZE = 0
+
+def shared_tt(hash_mb):
+    global SHARED_TT
+    if SHARED_TT is None or SHARED_TT.size_mb != hash_mb:
+        if SHARED_TT is not None:
+            SHARED_TT.close()
+        SHARED_TT = SharedTranspositionTable(hash_mb)
+    return SHARED_TT
+
+def worker_pool(size):
+    global POOL, POOL_SIZE
+    if POOL is None or POOL_SIZE != size:
+        if POOL is not None:
+            POOL.shutdown(cancel_futures=True)
+        POOL, POOL_SIZE = ProcessPoolExecutor(max_workers=size), size
+    return POOL
+
+@atexit.register
+def close_workers():
+    global SHARED_TT, POOL
+    if POOL is not None:
+        POOL.shutdown(cancel_futures=True)
+        POOL = None
+    if SHARED_TT is not None:
+        SHARED_TT.close()
+        SHARED_TT = None
+
+# returns an encoded move (see move.py), or None when side has no legal move;
+# workers > 1 runs the hard level over that many processes, as a Lazy SMP search or,
+# with parallel='root', by splitting the root moves
+def ai_choose_move(gs: GameState, level='easy', side='black', hash_mb=16,
+                   movetime_ms=None, clock_ms=None, increment_ms=0, max_depth=MAX_DEPTH, options=None,
+                   workers=1, parallel='smp'):
+    all_moves = gs.generate_moves(None, side)
+    if not all_moves: return None
+    # the quick levels only ever promote to a queen
+    moves = [mv for mv in all_moves if promotion_piece(mv) in (None, 'q')]
     if level == 'easy':
         return random.choice(moves)
     if level == 'medium':
         scored = []
         for mv in moves:
-            r,c,nr,nc = mv
+            to = move_to(mv)
+            nr, nc = to >> 3, to & 7
             score = 0
-            if gs.board[nr][nc] is not None:
-                score += 10 * PIECE_VALUE.get(gs.board[nr][nc].lower(),1)
+            # what the exchange on the target square wins, or loses if the piece just hangs
+            score += 10 * gs.see(mv)
             score -= (abs(3.5 - nr) + abs(3.5 - nc))
             scored.append((score, mv))
         scored.sort(reverse=True, key=lambda x: x[0])
         top = [mv for s,mv in scored[:max(1,len(scored)//3)]]
         return random.choice(top)
-    maximizing = True if side == 'white' else False
-    depth = 2
-    _, mv = minimax(gs, depth, -math.inf, math.inf, maximizing)
-    if mv is None:
+    age_history(HISTORY)
+    global last_search
+    budget_ms = time_budget_ms(movetime_ms, clock_ms, increment_ms)
+    if workers > 1 and parallel == 'root':
+        if TT.size_mb != hash_mb:
+            TT.resize(hash_mb)
+        TT.new_search()
+        mv, last_search = root_split(gs, side, budget_ms, max_depth, workers, TT, HISTORY, options, hash_mb)
+    elif workers > 1:
+        tt = shared_tt(hash_mb)
+        tt.new_search()
+        mv, last_search = lazy_smp(gs, side, budget_ms, max_depth, workers, tt, HISTORY, options)
+    else:
+        if TT.size_mb != hash_mb:
+            TT.resize(hash_mb)
+        TT.new_search()
+        mv, last_search = iterative_deepening(gs, side, budget_ms, max_depth, TT, HISTORY, options)
+    if mv not in all_moves:
         return random.choice(moves)
     return mv
@@ -0,0 +1,145 @@
+# squares are numbered r*8 + c, so a1 = 0, h1 = 7 and a8 = 56 (row 0 is white's back rank)
+FULL = 0xFFFFFFFFFFFFFFFF
+FILE_A = 0x0101010101010101
+FILE_B = FILE_A << 1
+FILE_G = FILE_A << 6
+FILE_H = FILE_A << 7
+NOT_A = FULL ^ FILE_A
+NOT_H = FULL ^ FILE_H
+NOT_AB = FULL ^ (FILE_A | FILE_B)
+NOT_GH = FULL ^ (FILE_G | FILE_H)
+RANK_1 = 0xFF
+RANK_3 = RANK_1 << 16
+RANK_6 = RANK_1 << 40
+RANK_8 = RANK_1 << 56
+LIGHT_SQUARES = 0x55AA55AA55AA55AA
+DARK_SQUARES = FULL ^ LIGHT_SQUARES
+
+BIT = [1 << sq for sq in range(64)]
+
+
+def iter_bits(bb):
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def lsb(bb):
+    return (bb & -bb).bit_length() - 1
+
+
+def popcount(bb):
+    return bb.bit_count()
+
+
+def north(bb): return (bb << 8) & FULL
+def south(bb): return bb >> 8
+def east(bb): return (bb << 1) & NOT_A
+def west(bb): return (bb >> 1) & NOT_H
+def north_east(bb): return (bb << 9) & NOT_A
+def north_west(bb): return (bb << 7) & NOT_H
+def south_east(bb): return (bb >> 7) & NOT_A
+def south_west(bb): return (bb >> 9) & NOT_H
+
+
+def knight_attacks(bb):
+    return (((bb << 17) & NOT_A) | ((bb << 15) & NOT_H) | ((bb << 10) & NOT_AB) | ((bb << 6) & NOT_GH)
+            | ((bb >> 17) & NOT_H) | ((bb >> 15) & NOT_A) | ((bb >> 10) & NOT_GH) | ((bb >> 6) & NOT_AB)) & FULL
+
+
+def king_attacks(bb):
+    row = bb | east(bb) | west(bb)
+    return (row | north(row) | south(row)) ^ bb
+
+
+def pawn_attacks(bb, white):
+    if white:
+        return north_east(bb) | north_west(bb)
+    return south_east(bb) | south_west(bb)
+
+
+def slide(bb, step, occupied):
+    # fills every ray of every bit in bb up to and including the first blocker
+    empty = FULL ^ occupied
+    attacks = 0
+    bb = step(bb)
+    while bb:
+        attacks |= bb
+        bb = step(bb & empty)
+    return attacks
+
+
+def bishop_attacks(bb, occupied):
+    return (slide(bb, north_east, occupied) | slide(bb, north_west, occupied)
+            | slide(bb, south_east, occupied) | slide(bb, south_west, occupied))
+
+
+def rook_attacks(bb, occupied):
+    return (slide(bb, north, occupied) | slide(bb, south, occupied)
+            | slide(bb, east, occupied) | slide(bb, west, occupied))
+
+
+def _rays():
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    for sq in range(64):
+        for forward, backward in ((north, south), (east, west), (north_east, south_west), (north_west, south_east)):
+            full = slide(BIT[sq], forward, 0) | slide(BIT[sq], backward, 0) | BIT[sq]
+            for step in (forward, backward):
+                passed = 0
+                bb = step(BIT[sq])
+                while bb:
+                    to = lsb(bb)
+                    between[sq][to] = passed
+                    line[sq][to] = full
+                    passed |= bb
+                    bb = step(bb)
+    return between, line
+
+
+# BETWEEN[a][b]: squares strictly between two aligned squares; LINE[a][b]: the whole
+# rank, file or diagonal through both. Both are 0 when a and b are not aligned.
+BETWEEN, LINE = _rays()
+
+
+# lookup tables for a single square, built once at import
+KNIGHT_ATTACKS = [knight_attacks(BIT[sq]) for sq in range(64)]
+KING_ATTACKS = [king_attacks(BIT[sq]) for sq in range(64)]
+# indexed [white][sq], white being a bool
+PAWN_ATTACKS = [[pawn_attacks(BIT[sq], False) for sq in range(64)],
+                [pawn_attacks(BIT[sq], True) for sq in range(64)]]
+
+# square-index step of every direction, with the shift that walks it
+STEPS = {8: north, -8: south, 1: east, -1: west, 9: north_east, 7: north_west, -7: south_east, -9: south_west}
+ORTHOGONAL_STEPS = (8, -8, 1, -1)
+DIAGONAL_STEPS = (9, 7, -7, -9)
+# RAYS[step][sq]: every square from sq (exclusive) to the board edge in that direction
+RAYS = {step: [slide(BIT[sq], fn, 0) for sq in range(64)] for step, fn in STEPS.items()}
+# DIRECTION[a][b]: the step leading from a to b, or 0 when they share no line
+DIRECTION = [[0] * 64 for _ in range(64)]
+for _step, _rays_from in RAYS.items():
+    for _sq in range(64):
+        for _to in iter_bits(_rays_from[_sq]):
+            DIRECTION[_sq][_to] = _step
+
+
+def ray_attacks(sq, occupied, steps):
+    # each ray runs to its nearest blocker: the lowest bit on rising rays, the highest on falling ones
+    attacks = 0
+    for step in steps:
+        ray = RAYS[step][sq]
+        blockers = ray & occupied
+        if blockers:
+            first = (blockers & -blockers).bit_length() - 1 if step > 0 else blockers.bit_length() - 1
+            ray ^= RAYS[step][first]
+        attacks |= ray
+    return attacks
+
+
+def bishop_attacks_from(sq, occupied):
+    return ray_attacks(sq, occupied, DIAGONAL_STEPS)
+
+
+def rook_attacks_from(sq, occupied):
+    return ray_attacks(sq, occupied, ORTHOGONAL_STEPS)
@@ -0,0 +1,55 @@
+from .utils import FILES
+
+# moves are 16-bit ints: bits 0-5 from square, 6-11 to square, 12-15 flags
+QUIET = 0
+DOUBLE_PUSH = 1
+KING_CASTLE = 2
+QUEEN_CASTLE = 3
+CAPTURE = 4        # flag bit, also set on en passant and capturing promotions
+EN_PASSANT = 5
+PROMOTION = 8      # flag bit; the low two flag bits then pick the piece from PROMOTION_PIECES
+PROMOTION_PIECES = 'nbrq'
+
+NULL_MOVE = 0      # a1 -> a1 never occurs, so 0 doubles as "no move"
+
+
+# GameState.encode_move builds a move from board coordinates; this one only packs the fields
+def pack_move(frm, to, flags=QUIET):
+    return frm | (to << 6) | (flags << 12)
+
+
+def decode_move(move):
+    # (from square, to square, flags)
+    return move & 63, (move >> 6) & 63, move >> 12
+
+
+def move_from(move):
+    return move & 63
+
+
+def move_to(move):
+    return (move >> 6) & 63
+
+
+def move_flags(move):
+    return move >> 12
+
+
+def is_capture(move):
+    return bool(move & (CAPTURE << 12))
+
+
+def promotion_piece(move):
+    # lower-case piece letter, or None for a non-promotion
+    flags = move >> 12
+    return PROMOTION_PIECES[flags & 3] if flags & PROMOTION else None
+
+
+def move_to_tuple(move):
+    frm, to, _ = decode_move(move)
+    return (frm >> 3, frm & 7, to >> 3, to & 7)
+
+
+def move_to_uci(move):
+    frm, to, _ = decode_move(move)
+    return f"{FILES[frm & 7]}{(frm >> 3) + 1}{FILES[to & 7]}{(to >> 3) + 1}{promotion_piece(move) or ''}"
@@ -0,0 +1,92 @@
+from .utils import PIECE_VALUE
+
+# piece-square tables in centipawns from white's point of view, written rank 8 first so
+# they read like a diagram; black uses the vertically mirrored square
+_MG = {
+    'p': [  0,   0,   0,   0,   0,   0,   0,   0,
+           50,  50,  50,  50,  50,  50,  50,  50,
+           10,  10,  20,  30,  30,  20,  10,  10,
+            5,   5,  10,  25,  25,  10,   5,   5,
+            0,   0,   0,  20,  20,   0,   0,   0,
+            5,  -5, -10,   0,   0, -10,  -5,   5,
+            5,  10,  10, -20, -20,  10,  10,   5,
+            0,   0,   0,   0,   0,   0,   0,   0],
+    'n': [-50, -40, -30, -30, -30, -30, -40, -50,
+          -40, -20,   0,   0,   0,   0, -20, -40,
+          -30,   0,  10,  15,  15,  10,   0, -30,
+          -30,   5,  15,  20,  20,  15,   5, -30,
+          -30,   0,  15,  20,  20,  15,   0, -30,
+          -30,   5,  10,  15,  15,  10,   5, -30,
+          -40, -20,   0,   5,   5,   0, -20, -40,
+          -50, -40, -30, -30, -30, -30, -40, -50],
+    'b': [-20, -10, -10, -10, -10, -10, -10, -20,
+          -10,   0,   0,   0,   0,   0,   0, -10,
+          -10,   0,   5,  10,  10,   5,   0, -10,
+          -10,   5,   5,  10,  10,   5,   5, -10,
+          -10,   0,  10,  10,  10,  10,   0, -10,
+          -10,  10,  10,  10,  10,  10,  10, -10,
+          -10,   5,   0,   0,   0,   0,   5, -10,
+          -20, -10, -10, -10, -10, -10, -10, -20],
+    'r': [  0,   0,   0,   0,   0,   0,   0,   0,
+            5,  10,  10,  10,  10,  10,  10,   5,
+           -5,   0,   0,   0,   0,   0,   0,  -5,
+           -5,   0,   0,   0,   0,   0,   0,  -5,
+           -5,   0,   0,   0,   0,   0,   0,  -5,
+           -5,   0,   0,   0,   0,   0,   0,  -5,
+           -5,   0,   0,   0,   0,   0,   0,  -5,
+            0,   0,   0,   5,   5,   0,   0,   0],
+    'q': [-20, -10, -10,  -5,  -5, -10, -10, -20,
+          -10,   0,   0,   0,   0,   0,   0, -10,
+          -10,   0,   5,   5,   5,   5,   0, -10,
+           -5,   0,   5,   5,   5,   5,   0,  -5,
+            0,   0,   5,   5,   5,   5,   0,  -5,
+          -10,   5,   5,   5,   5,   5,   0, -10,
+          -10,   0,   5,   0,   0,   0,   0, -10,
+          -20, -10, -10,  -5,  -5, -10, -10, -20],
+    'k': [-30, -40, -40, -50, -50, -40, -40, -30,
+          -30, -40, -40, -50, -50, -40, -40, -30,
+          -30, -40, -40, -50, -50, -40, -40, -30,
+          -30, -40, -40, -50, -50, -40, -40, -30,
+          -20, -30, -30, -40, -40, -30, -30, -20,
+          -10, -20, -20, -20, -20, -20, -20, -10,
+           20,  20,   0,   0,   0,   0,  20,  20,
+           20,  30,  10,   0,   0,  10,  30,  20],
+}
+
+_EG = dict(_MG)
+_EG['p'] = [  0,   0,   0,   0,   0,   0,   0,   0,
+             80,  80,  80,  80,  80,  80,  80,  80,
+             50,  50,  50,  50,  50,  50,  50,  50,
+             30,  30,  30,  30,  30,  30,  30,  30,
+             15,  15,  15,  15,  15,  15,  15,  15,
+              5,   5,   5,   5,   5,   5,   5,   5,
+              0,   0,   0,   0,   0,   0,   0,   0,
+              0,   0,   0,   0,   0,   0,   0,   0]
+_EG['k'] = [-50, -40, -30, -20, -20, -30, -40, -50,
+            -30, -20, -10,   0,   0, -10, -20, -30,
+            -30, -10,  20,  30,  30,  20, -10, -30,
+            -30, -10,  30,  40,  40,  30, -10, -30,
+            -30, -10,  30,  40,  40,  30, -10, -30,
+            -30, -10,  20,  30,  30,  20, -10, -30,
+            -30, -30,   0,   0,   0,   0, -30, -30,
+            -50, -30, -30, -30, -30, -30, -30, -50]
+
+# game phase weight of each piece; the starting position adds up to PHASE_TOTAL
+PHASE_TOTAL = 24
+PHASE = {p: w for pl, w in (('p', 0), ('n', 1), ('b', 1), ('r', 2), ('q', 4), ('k', 0))
+         for p in (pl, pl.upper())}
+
+
+def _signed_tables(tables):
+    # material plus placement, indexed [piece][square] and already negated for black
+    out = {}
+    for pl, table in tables.items():
+        material = 0 if pl == 'k' else PIECE_VALUE[pl] * 100
+        # table index 0 is a8, so white square r*8 + c reads entry (7 - r)*8 + c, i.e. sq ^ 56
+        out[pl.upper()] = [material + table[sq ^ 56] for sq in range(64)]
+        out[pl] = [-(material + table[sq]) for sq in range(64)]
+    return out
+
+
+MG = _signed_tables(_MG)
+EG = _signed_tables(_EG)
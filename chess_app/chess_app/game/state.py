@@ -1,16 +1,35 @@
-from copy import deepcopy
+from array import array
 import json
 
-from .utils import FILES
+from .utils import FILES, PIECE_VALUE
+from .pst import MG, EG, PHASE
+from .move import (QUIET, DOUBLE_PUSH, KING_CASTLE, QUEEN_CASTLE, CAPTURE, EN_PASSANT, PROMOTION,
+                   PROMOTION_PIECES, NULL_MOVE, pack_move, decode_move, move_from, move_to, move_flags,
+                   move_to_tuple, move_to_uci, promotion_piece)
+from .zobrist import PIECE_KEYS, SIDE_KEY, CASTLING_KEYS, EN_PASSANT_KEYS
+from .bitboard import (BETWEEN, LINE, BIT, FULL, RANK_1, RANK_3, RANK_6, RANK_8, LIGHT_SQUARES, DARK_SQUARES, KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS,
+                       DIRECTION, RAYS, DIAGONAL_STEPS, ORTHOGONAL_STEPS, iter_bits, lsb, popcount, north, south, knight_attacks, king_attacks, pawn_attacks,
+                       bishop_attacks, rook_attacks, bishop_attacks_from, rook_attacks_from)
+
+PIECES = 'PNBRQKpnbrqk'
+WHITE_PIECES = 'PNBRQK'
+BLACK_PIECES = 'pnbrqk'
+CAPTURE_BITS = CAPTURE << 12
+
 
 class GameState:
     def __init__(self):
-        self.board = self.create_starting_board()
         self.white_to_move = True
         # castling rights: [white_kingside, white_queenside, black_kingside, black_queenside]
         self.castling = [True, True, True, True]
         # en-passant target square as (r,c) where a pawn may be captured, or None
         self.en_passant = None
+        # the position is held as one bitboard per piece letter (the square set of that piece
+        # type), occupancy per colour, a square -> piece mailbox and each side's king square;
+        # self.board is an 8x8 view derived from them. Assigning it also sets the Zobrist
+        # key, which needs the side to move, castling and en passant above
+        self.board = self.create_starting_board()
+        # one compact undo record per move played (see push), oldest first
         self.move_history = []
         self.halfmove_clock = 0
         self.fullmove_number = 1
@@ -32,6 +51,102 @@ class GameState:
         b[7][4] = 'k'
         return b
 
+    # the 8x8 list is a view derived from the bitboards; assigning one rebuilds them and
+    # the Zobrist key, which put_piece/remove_piece and push/pop then keep up to date
+    @property
+    def board(self):
+        if self._board_view is None:
+            self._board_view = [self.squares[r*8:r*8+8] for r in range(8)]
+        return self._board_view
+
+    @board.setter
+    def board(self, b):
+        self.pieces, self.occ = self.bitboards_from_board(b)
+        self.squares = [b[r][c] for r in range(8) for c in range(8)]
+        self.king_square = {'white': None, 'black': None}
+        for color, king in (('white', 'K'), ('black', 'k')):
+            if self.pieces[king]:
+                self.king_square[color] = lsb(self.pieces[king])
+        # running evaluation terms (white minus black, centipawns) kept by put_piece/remove_piece
+        self.mg = self.eg = self.phase = 0
+        for sq, p in enumerate(self.squares):
+            if p is not None:
+                self.mg += MG[p][sq]; self.eg += EG[p][sq]; self.phase += PHASE[p]
+        self._board_view = None
+        self.hash = self.compute_hash()
+
+    # an independent copy for the search, built in O(64) whatever the game length: undo
+    # records are immutable and shared, and only those back to the last irreversible move
+    # (all a repetition check can reach) are kept
+    def copy(self):
+        gs = GameState.__new__(GameState)
+        gs.pieces = dict(self.pieces)
+        gs.occ = dict(self.occ)
+        gs.squares = self.squares[:]
+        gs.king_square = dict(self.king_square)
+        gs.mg, gs.eg, gs.phase = self.mg, self.eg, self.phase
+        gs._board_view = None
+        gs.white_to_move = self.white_to_move
+        gs.castling = self.castling[:]
+        gs.en_passant = self.en_passant
+        keep = min(self.halfmove_clock, len(self.move_history))
+        gs.move_history = self.move_history[len(self.move_history) - keep:]
+        gs.halfmove_clock = self.halfmove_clock
+        gs.fullmove_number = self.fullmove_number
+        gs.hash = self.hash
+        return gs
+
+    def bitboards_from_board(self, b):
+        pieces = {p: 0 for p in PIECES}
+        occ = {'white': 0, 'black': 0}
+        for r in range(8):
+            for c in range(8):
+                p = b[r][c]
+                if p is None: continue
+                pieces[p] |= BIT[r*8+c]
+                occ['white' if p.isupper() else 'black'] |= BIT[r*8+c]
+        return pieces, occ
+
+    def put_piece(self, sq, p):
+        self.pieces[p] |= BIT[sq]
+        self.occ['white' if p.isupper() else 'black'] |= BIT[sq]
+        self.squares[sq] = p
+        if p == 'K': self.king_square['white'] = sq
+        elif p == 'k': self.king_square['black'] = sq
+        self.hash ^= PIECE_KEYS[p][sq]
+        self.mg += MG[p][sq]; self.eg += EG[p][sq]; self.phase += PHASE[p]
+        self._board_view = None
+
+    def remove_piece(self, sq):
+        p = self.squares[sq]
+        if p is None: return None
+        self.pieces[p] ^= BIT[sq]
+        self.occ['white' if p.isupper() else 'black'] ^= BIT[sq]
+        self.squares[sq] = None
+        if p == 'K': self.king_square['white'] = None
+        elif p == 'k': self.king_square['black'] = None
+        self.hash ^= PIECE_KEYS[p][sq]
+        self.mg -= MG[p][sq]; self.eg -= EG[p][sq]; self.phase -= PHASE[p]
+        self._board_view = None
+        return p
+
+    # full rehash; only needed when a position is set up from scratch
+    def compute_hash(self):
+        h = 0
+        for sq, p in enumerate(self.squares):
+            if p is not None:
+                h ^= PIECE_KEYS[p][sq]
+        return h ^ self.state_hash()
+
+    def state_hash(self):
+        h = 0 if self.white_to_move else SIDE_KEY
+        for i in range(4):
+            if self.castling[i]:
+                h ^= CASTLING_KEYS[i]
+        if self.en_passant:
+            h ^= EN_PASSANT_KEYS[self.en_passant[1]]
+        return h
+
     def in_bounds(self, r, c):
         return 0 <= r < 8 and 0 <= c < 8
 
@@ -46,283 +161,679 @@ class GameState:
         return 'white' if self.is_white(piece) else 'black'
 
     def locate_king(self, color, board=None):
-        target = 'K' if color == 'white' else 'k'
+        if board is None:
+            sq = self.king_square[color]
+        else:
+            kings = self.bitboards_from_board(board)[0]['K' if color == 'white' else 'k']
+            sq = lsb(kings) if kings else None
+        if sq is None:
+            return None
+        return (sq >> 3, sq & 7)
+
+    def attacks_from(self, sq, p, occupied):
+        pl = p.lower()
+        if pl == 'p': return PAWN_ATTACKS[p.isupper()][sq]
+        if pl == 'n': return KNIGHT_ATTACKS[sq]
+        if pl == 'b': return bishop_attacks_from(sq, occupied)
+        if pl == 'r': return rook_attacks_from(sq, occupied)
+        if pl == 'q': return bishop_attacks_from(sq, occupied) | rook_attacks_from(sq, occupied)
+        return KING_ATTACKS[sq]
+
+    # every square attacked by one side, computed set-wise for each piece type
+    def attack_map(self, color, pieces=None, occupied=None):
+        pieces = pieces if pieces is not None else self.pieces
+        if occupied is None:
+            occupied = 0
+            for bb in pieces.values(): occupied |= bb
+        names = WHITE_PIECES if color == 'white' else BLACK_PIECES
+        p, n, b, r, q, k = (pieces[x] for x in names)
+        return (pawn_attacks(p, color == 'white') | knight_attacks(n) | king_attacks(k)
+                | bishop_attacks(b | q, occupied) | rook_attacks(r | q, occupied))
+
+    # one table lookup; sliders also need the squares between src and dst to be empty
+    def piece_attacks_square(self, src, dst, board=None):
         board = board if board is not None else self.board
-        for r in range(8):
-            for c in range(8):
-                if board[r][c] == target:
-                    return (r,c)
-        return None
-
-    def piece_attacks_square(self, src, dst, board):
-        r,c = src
-        tr, tc = dst
-        p = board[r][c]
+        p = board[src[0]][src[1]]
         if p is None: return False
-        color = 'white' if p.isupper() else 'black'
+        s, t = src[0]*8 + src[1], dst[0]*8 + dst[1]
         pl = p.lower()
-        dr = tr - r
-        dc = tc - c
-
-        if pl == 'p':
-            direction = 1 if color == 'white' else -1
-            return dr == direction and abs(dc) == 1
-        if pl == 'n':
-            return (abs(dr), abs(dc)) in [(1,2),(2,1)]
-        if pl == 'b':
-            if abs(dr) != abs(dc) or dr == 0: return False
-            step_r = 1 if dr>0 else -1
-            step_c = 1 if dc>0 else -1
-            rr, cc = r+step_r, c+step_c
-            while (rr,cc) != (tr,tc):
-                if board[rr][cc] is not None: return False
-                rr += step_r; cc += step_c
-            return True
-        if pl == 'r':
-            if dr != 0 and dc != 0: return False
-            step_r = 0 if dr==0 else (1 if dr>0 else -1)
-            step_c = 0 if dc==0 else (1 if dc>0 else -1)
-            rr, cc = r+step_r, c+step_c
-            while (rr,cc) != (tr,tc):
-                if board[rr][cc] is not None: return False
-                rr += step_r; cc += step_c
+        if pl == 'p': return bool(PAWN_ATTACKS[p.isupper()][s] & BIT[t])
+        if pl == 'n': return bool(KNIGHT_ATTACKS[s] & BIT[t])
+        if pl == 'k': return bool(KING_ATTACKS[s] & BIT[t])
+        step = DIRECTION[s][t]
+        if not step: return False
+        diagonal = step in (9, 7, -7, -9)
+        if (pl == 'b' and not diagonal) or (pl == 'r' and diagonal): return False
+        for sq in iter_bits(BETWEEN[s][t]):
+            if board[sq >> 3][sq & 7] is not None: return False
+        return True
+
+    # reverse attack queries: look outward from the target square as a knight, king, pawn
+    # and slider, so the cost depends on the rays around one square, not on the piece count
+    def attackers_to(self, sq, color, occupied=None, pieces=None):
+        pieces = pieces if pieces is not None else self.pieces
+        if occupied is None:
+            occupied = self.occ['white'] | self.occ['black']
+        white = color == 'white'
+        p, n, b, r, q, k = (pieces[x] for x in (WHITE_PIECES if white else BLACK_PIECES))
+        return ((PAWN_ATTACKS[not white][sq] & p) | (KNIGHT_ATTACKS[sq] & n) | (KING_ATTACKS[sq] & k)
+                | (bishop_attacks_from(sq, occupied) & (b | q)) | (rook_attacks_from(sq, occupied) & (r | q)))
+
+    # attackers_to() that stops at the first attacker found, checking one ray at a time
+    def is_square_attacked(self, sq, color, occupied=None, pieces=None):
+        pieces = pieces if pieces is not None else self.pieces
+        if occupied is None:
+            occupied = self.occ['white'] | self.occ['black']
+        white = color == 'white'
+        p, n, b, r, q, k = (pieces[x] for x in (WHITE_PIECES if white else BLACK_PIECES))
+        if (PAWN_ATTACKS[not white][sq] & p) or (KNIGHT_ATTACKS[sq] & n) or (KING_ATTACKS[sq] & k):
             return True
-        if pl == 'q':
-            if (abs(dr) == abs(dc) and dr != 0) or (dr == 0 and dc != 0) or (dc == 0 and dr != 0):
-                step_r = 0 if dr==0 else (1 if dr>0 else -1)
-                step_c = 0 if dc==0 else (1 if dc>0 else -1)
-                rr, cc = r+step_r, c+step_c
-                while (rr,cc) != (tr,tc):
-                    if board[rr][cc] is not None: return False
-                    rr += step_r; cc += step_c
-                return True
-            return False
-        if pl == 'k':
-            return max(abs(dr), abs(dc)) == 1
+        for steps, sliders in ((DIAGONAL_STEPS, b | q), (ORTHOGONAL_STEPS, r | q)):
+            if not sliders:
+                continue
+            for step in steps:
+                blockers = RAYS[step][sq] & occupied
+                if blockers and BIT[lsb(blockers) if step > 0 else blockers.bit_length() - 1] & sliders:
+                    return True
         return False
 
     def is_in_check(self, color, board=None):
-        board = board if board is not None else self.board
-        king_pos = self.locate_king(color, board)
-        if not king_pos:
+        enemy = 'black' if color == 'white' else 'white'
+        if board is None:
+            ksq = self.king_square[color]
+            return ksq is None or self.is_square_attacked(ksq, enemy)
+        pieces, occ = self.bitboards_from_board(board)
+        king = pieces['K' if color == 'white' else 'k']
+        if not king:
             return True
-        kr, kc = king_pos
+        return self.is_square_attacked(lsb(king), enemy, occ['white'] | occ['black'], pieces)
+
+    def pseudo_targets(self, sq, piece):
+        color = 'white' if piece.isupper() else 'black'
+        own = self.occ[color]
+        enemy = self.occ['black' if color == 'white' else 'white']
+        occupied = own | enemy
+        p = piece.lower()
+        if p != 'p':
+            return self.attacks_from(sq, piece, occupied) & ~own
+        bb = BIT[sq]
+        empty = FULL ^ occupied
+        targets = self.attacks_from(sq, piece, occupied) & enemy
+        if color == 'white':
+            single = north(bb) & empty
+            targets |= single | (north(single & RANK_3) & empty)
+        else:
+            single = south(bb) & empty
+            targets |= single | (south(single & RANK_6) & empty)
+        if self.en_passant:
+            ep_r, ep_c = self.en_passant
+            if ep_r == (5 if color == 'white' else 2):
+                targets |= self.attacks_from(sq, piece, occupied) & BIT[ep_r*8+ep_c]
+        return targets
+
+    def castling_targets(self, color):
+        targets = []
+        occupied = self.occ['white'] | self.occ['black']
         enemy = 'black' if color == 'white' else 'white'
-        for r in range(8):
-            for c in range(8):
-                p = board[r][c]
-                if p is None: continue
-                if enemy == 'white' and not p.isupper(): continue
-                if enemy == 'black' and not p.islower(): continue
-                if self.piece_attacks_square((r,c),(kr,kc),board):
-                    return True
-        return False
+        base = 0 if color == 'white' else 56
+        rights = (0, 1) if color == 'white' else (2, 3)
+        if self.squares[base+4] != ('K' if color == 'white' else 'k'):
+            return targets
+        if not (self.castling[rights[0]] or self.castling[rights[1]]):
+            return targets
+        attacked = lambda sq: self.is_square_attacked(sq, enemy, occupied)
+        if attacked(base+4):
+            return targets
+        if self.castling[rights[0]] and not occupied & (BIT[base+5] | BIT[base+6]):
+            if not attacked(base+5) and not attacked(base+6):
+                targets.append(base+6)
+        if self.castling[rights[1]] and not occupied & (BIT[base+1] | BIT[base+2] | BIT[base+3]):
+            if not attacked(base+3) and not attacked(base+2):
+                targets.append(base+2)
+        return targets
 
     def generate_moves_for_square(self, r, c):
-        piece = self.board[r][c]
+        piece = self.squares[r*8 + c]
         if piece is None: return []
-        color = 'white' if piece.isupper() else 'black'
-        direction = 1 if color == 'white' else -1
-        moves = []
-        p = piece.lower()
-        if p == 'p':
-            fr = r + direction
-            if self.in_bounds(fr, c) and self.board[fr][c] is None:
-                moves.append((fr, c))
-                start_row = 1 if color == 'white' else 6
-                fr2 = r + 2*direction
-                if r == start_row and self.in_bounds(fr2, c) and self.board[fr2][c] is None:
-                    moves.append((fr2, c))
-            for dc in (-1, 1):
-                fc = c + dc
-                if self.in_bounds(fr, fc):
-                    target = self.board[fr][fc]
-                    if target is not None and self.ally(target) != color:
-                        moves.append((fr, fc))
-            if self.en_passant:
-                ep_r, ep_c = self.en_passant
-                if fr == ep_r and abs(ep_c - c) == 1:
-                    moves.append((fr, ep_c))
-        elif p == 'n':
-            for dr, dc in [(2,1),(2,-1),(-2,1),(-2,-1),(1,2),(1,-2),(-1,2),(-1,-2)]:
-                nr, nc = r+dr, c+dc
-                if not self.in_bounds(nr, nc): continue
-                if self.board[nr][nc] is None or self.ally(self.board[nr][nc]) != color:
-                    moves.append((nr, nc))
-        elif p in ('b','r','q'):
-            directions = []
-            if p in ('b','q'):
-                directions += [(1,1),(1,-1),(-1,1),(-1,-1)]
-            if p in ('r','q'):
-                directions += [(1,0),(-1,0),(0,1),(0,-1)]
-            for dr, dc in directions:
-                nr, nc = r+dr, c+dc
-                while self.in_bounds(nr, nc):
-                    if self.board[nr][nc] is None:
-                        moves.append((nr, nc))
-                    else:
-                        if self.ally(self.board[nr][nc]) != color:
-                            moves.append((nr, nc))
-                        break
-                    nr += dr; nc += dc
-        elif p == 'k':
-            for dr in (-1,0,1):
-                for dc in (-1,0,1):
-                    if dr == 0 and dc == 0: continue
-                    nr, nc = r+dr, c+dc
-                    if not self.in_bounds(nr, nc): continue
-                    if self.board[nr][nc] is None or self.ally(self.board[nr][nc]) != color:
-                        moves.append((nr, nc))
-            if color == 'white' and r == 0 and c == 4:
-                if self.castling[0] and self.board[0][5] is None and self.board[0][6] is None:
-                    if not self.is_in_check('white') and not self.square_under_attack((0,5),'white') and not self.square_under_attack((0,6),'white'):
-                        moves.append((0,6))
-                if self.castling[1] and self.board[0][1] is None and self.board[0][2] is None and self.board[0][3] is None:
-                    if not self.is_in_check('white') and not self.square_under_attack((0,3),'white') and not self.square_under_attack((0,2),'white'):
-                        moves.append((0,2))
-            if color == 'black' and r == 7 and c == 4:
-                if self.castling[2] and self.board[7][5] is None and self.board[7][6] is None:
-                    if not self.is_in_check('black') and not self.square_under_attack((7,5),'black') and not self.square_under_attack((7,6),'black'):
-                        moves.append((7,6))
-                if self.castling[3] and self.board[7][1] is None and self.board[7][2] is None and self.board[7][3] is None:
-                    if not self.is_in_check('black') and not self.square_under_attack((7,3),'black') and not self.square_under_attack((7,2),'black'):
-                        moves.append((7,2))
+        sq = r*8 + c
+        moves = [(t >> 3, t & 7) for t in iter_bits(self.pseudo_targets(sq, piece))]
+        if piece.lower() == 'k':
+            moves += [(t >> 3, t & 7) for t in self.castling_targets('white' if piece.isupper() else 'black')]
         return moves
 
     def square_under_attack(self, square, color):
         sr, sc = square
         enemy = 'black' if color == 'white' else 'white'
-        for r in range(8):
-            for c in range(8):
-                p = self.board[r][c]
-                if p is None: continue
-                if enemy == 'white' and not p.isupper(): continue
-                if enemy == 'black' and not p.islower(): continue
-                if self.piece_attacks_square((r,c),(sr,sc), self.board):
-                    return True
-        return False
-
-    def generate_legal_moves(self, for_color=None):
-        color = for_color if for_color is not None else ('white' if self.white_to_move else 'black')
-        moves = []
-        for r in range(8):
-            for c in range(8):
-                piece = self.board[r][c]
-                if piece is None: continue
-                if color == 'white' and not piece.isupper(): continue
-                if color == 'black' and not piece.islower(): continue
-                candidates = self.generate_moves_for_square(r,c)
-                for nr,nc in candidates:
-                    new_board = deepcopy(self.board)
-                    moving = new_board[r][c]
-                    if moving and moving.lower() == 'p' and self.en_passant and (nr, nc) == self.en_passant and new_board[nr][nc] is None:
-                        capture_r = r
-                        capture_c = nc
-                        new_board[capture_r][capture_c] = None
-                    new_board[nr][nc] = new_board[r][c]
-                    new_board[r][c] = None
-                    if not self.is_in_check(color, new_board):
-                        moves.append((r,c,nr,nc))
-        return moves
+        return self.is_square_attacked(sr*8+sc, enemy)
 
-    def make_move(self, r, c, nr, nc, promotion_choice=None):
-        piece = self.board[r][c]
-        if piece is None: return False
-        color = 'white' if piece.isupper() else 'black'
-        legal = False
-        for mv in self.generate_legal_moves(color):
-            if mv == (r,c,nr,nc):
-                legal = True
-                break
-        if not legal:
-            return False
+    def castling_bits(self):
+        return sum(1 << i for i in range(4) if self.castling[i])
 
-        state_snapshot = {
-            'board': deepcopy(self.board),
-            'white_to_move': self.white_to_move,
-            'castling': deepcopy(self.castling),
-            'en_passant': deepcopy(self.en_passant),
-            'halfmove_clock': self.halfmove_clock,
-            'fullmove_number': self.fullmove_number,
-            'move': f"{r},{c}->{nr},{nc}"
-        }
-        self.move_history.append(state_snapshot)
+    # applies an encoded move in place and appends its undo record to move_history:
+    # (move, moving piece, captured piece, castling bits, en passant, halfmove clock,
+    # fullmove number, hash) -- only what pop() cannot recompute, never a board copy
+    def push(self, move):
+        frm, to, flags = decode_move(move)
+        moving = self.squares[frm]
+        cap_sq = to
+        if flags == EN_PASSANT:
+            cap_sq = to - 8 if moving == 'P' else to + 8
+        captured = self.squares[cap_sq]
+        self.move_history.append((move, moving, captured, self.castling_bits(),
+                                  self.en_passant, self.halfmove_clock, self.fullmove_number, self.hash))
+        self.hash ^= self.state_hash()
 
-        moving = self.board[r][c]
-        target = self.board[nr][nc]
-        if moving.lower() == 'p' or target is not None:
+        if moving in ('P', 'p') or captured is not None:
             self.halfmove_clock = 0
         else:
             self.halfmove_clock += 1
 
-        if moving.lower() == 'p' and self.en_passant and (nr, nc) == self.en_passant and self.board[nr][nc] is None:
-            cap_r = nr - (1 if moving.isupper() else -1)
-            cap_c = nc
-            if self.in_bounds(cap_r, cap_c):
-                self.board[cap_r][cap_c] = None
-
-        if moving.lower() == 'k' and abs(nc - c) == 2:
-            if nc == 6:
-                if moving.isupper():
-                    self.board[0][7] = None
-                    self.board[0][5] = 'R'
-                else:
-                    self.board[7][7] = None
-                    self.board[7][5] = 'r'
-            else:
-                if moving.isupper():
-                    self.board[0][0] = None
-                    self.board[0][3] = 'R'
-                else:
-                    self.board[7][0] = None
-                    self.board[7][3] = 'r'
-
-        self.board[nr][nc] = self.board[r][c]
-        self.board[r][c] = None
+        if captured is not None:
+            self.remove_piece(cap_sq)
+        if flags == KING_CASTLE:
+            self.put_piece(frm+1, self.remove_piece(frm+3))
+        elif flags == QUEEN_CASTLE:
+            self.put_piece(frm-1, self.remove_piece(frm-4))
+        self.remove_piece(frm)
+        placed = moving
+        if flags & PROMOTION:
+            placed = PROMOTION_PIECES[flags & 3]
+            if moving == 'P': placed = placed.upper()
+        self.put_piece(to, placed)
 
         if moving == 'K':
             self.castling[0] = False; self.castling[1] = False
         if moving == 'k':
             self.castling[2] = False; self.castling[3] = False
-        if (r,c) == (0,0) or (nr,nc) == (0,0):
+        if frm == 0 or to == 0:
             self.castling[1] = False
-        if (r,c) == (0,7) or (nr,nc) == (0,7):
+        if frm == 7 or to == 7:
             self.castling[0] = False
-        if (r,c) == (7,0) or (nr,nc) == (7,0):
+        if frm == 56 or to == 56:
             self.castling[3] = False
-        if (r,c) == (7,7) or (nr,nc) == (7,7):
+        if frm == 63 or to == 63:
             self.castling[2] = False
 
         self.en_passant = None
-        if moving.lower() == 'p' and abs(nr - r) == 2:
-            ep_r = (r + nr) // 2
-            ep_c = c
-            self.en_passant = (ep_r, ep_c)
-
-        if self.board[nr][nc] == 'P' and nr == 7:
-            choice = promotion_choice or 'Q'
-            self.board[nr][nc] = choice.upper()
-        if self.board[nr][nc] == 'p' and nr == 0:
-            choice = promotion_choice or 'q'
-            self.board[nr][nc] = choice.lower()
+        if flags == DOUBLE_PUSH:
+            self.en_passant = ((frm + to) >> 4, frm & 7)
 
         self.white_to_move = not self.white_to_move
         if not self.white_to_move:
             self.fullmove_number += 1
+        self.hash ^= self.state_hash()
+
+    def pop(self):
+        move, moving, captured, castling, en_passant, halfmove, fullmove, h = self.move_history.pop()
+        frm, to, flags = decode_move(move)
+        self.remove_piece(to)
+        self.put_piece(frm, moving)
+        if captured is not None:
+            if flags == EN_PASSANT:
+                self.put_piece(to - 8 if moving == 'P' else to + 8, captured)
+            else:
+                self.put_piece(to, captured)
+        if flags == KING_CASTLE:
+            self.put_piece(frm+3, self.remove_piece(frm+1))
+        elif flags == QUEEN_CASTLE:
+            self.put_piece(frm-4, self.remove_piece(frm-1))
+        self.castling = [bool(castling >> i & 1) for i in range(4)]
+        self.en_passant = en_passant
+        self.halfmove_clock = halfmove
+        self.fullmove_number = fullmove
+        self.white_to_move = not self.white_to_move
+        self.hash = h
+
+    # passes the turn, for null-move pruning. The halfmove clock restarts so a repetition
+    # check never looks back across the null move; pop_null undoes it.
+    def push_null(self):
+        self.move_history.append((NULL_MOVE, None, None, self.castling_bits(),
+                                  self.en_passant, self.halfmove_clock, self.fullmove_number, self.hash))
+        self.hash ^= self.state_hash()
+        self.en_passant = None
+        self.halfmove_clock = 0
+        self.white_to_move = not self.white_to_move
+        if not self.white_to_move:
+            self.fullmove_number += 1
+        self.hash ^= self.state_hash()
+
+    def pop_null(self):
+        _, _, _, _, en_passant, halfmove, fullmove, h = self.move_history.pop()
+        self.en_passant = en_passant
+        self.halfmove_clock = halfmove
+        self.fullmove_number = fullmove
+        self.white_to_move = not self.white_to_move
+        self.hash = h
+
+    # checkers of color's king and, for each absolutely pinned piece, the line it may move along
+    def check_info(self, color):
+        white = color == 'white'
+        ksq = self.king_square[color]
+        if ksq is None:
+            return None, 0, {}
+        own = self.occ[color]
+        enemy_occ = self.occ['black' if white else 'white']
+        occupied = own | enemy_occ
+        b, r, q = (self.pieces[x] for x in ('brq' if white else 'BRQ'))
+        checkers = self.attackers_to(ksq, 'black' if white else 'white', occupied)
+        pins = {}
+        # sliders that would hit the king if only enemy pieces blocked: one own piece between is pinned
+        snipers = (bishop_attacks_from(ksq, enemy_occ) & (b | q)) | (rook_attacks_from(ksq, enemy_occ) & (r | q))
+        for s in iter_bits(snipers):
+            blockers = BETWEEN[ksq][s] & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pins[lsb(blockers)] = LINE[ksq][s]
+        return ksq, checkers, pins
+
+    # en passant can expose the king along the rank once both pawns leave it, so it is
+    # tested against the occupancy after the capture instead of the pin masks
+    def en_passant_is_legal(self, frm, to, color, ksq, checkers):
+        white = color == 'white'
+        cap = to - 8 if white else to + 8
+        if checkers & ~BIT[cap] & (self.pieces['n' if white else 'N'] | self.pieces['p' if white else 'P']):
+            return False
+        occupied = (self.occ['white'] | self.occ['black'] | BIT[to]) ^ BIT[frm] ^ BIT[cap]
+        b, r, q = (self.pieces[x] for x in ('brq' if white else 'BRQ'))
+        return not ((bishop_attacks_from(ksq, occupied) & (b | q)) | (rook_attacks_from(ksq, occupied) & (r | q)))
+
+    def add_piece_moves(self, color, moves, mask, ksq, checkers, pins):
+        white = color == 'white'
+        enemy_occ = self.occ['black' if white else 'white']
+        ep = self.en_passant
+        ep_bb = BIT[ep[0]*8 + ep[1]] if ep else 0
+        pawn = 'P' if white else 'p'
+        last_rank = RANK_8 if white else RANK_1
+        append = moves.append
+        for sq in iter_bits(self.occ[color] ^ BIT[ksq]):
+            piece = self.squares[sq]
+            targets = self.pseudo_targets(sq, piece) & pins.get(sq, FULL)
+            if piece != pawn:
+                targets &= mask
+                for to in iter_bits(targets & enemy_occ):
+                    append(sq | (to << 6) | CAPTURE_BITS)
+                for to in iter_bits(targets & ~enemy_occ):
+                    append(sq | (to << 6))
+                continue
+            # en passant is a capture, so a quiets-only mask (no enemy squares) leaves it out
+            if targets & ep_bb:
+                targets ^= ep_bb
+                to = lsb(ep_bb)
+                if mask & enemy_occ and self.en_passant_is_legal(sq, to, color, ksq, checkers):
+                    append(sq | (to << 6) | (EN_PASSANT << 12))
+            for to in iter_bits(targets & mask):
+                flags = CAPTURE if BIT[to] & enemy_occ else QUIET
+                if BIT[to] & last_rank:
+                    for piece_bits in (3, 2, 1, 0):
+                        append(sq | (to << 6) | ((flags | PROMOTION | piece_bits) << 12))
+                elif to - sq in (16, -16):
+                    append(sq | (to << 6) | (DOUBLE_PUSH << 12))
+                else:
+                    append(sq | (to << 6) | (flags << 12))
+
+    def add_king_moves(self, color, moves, ksq, mask=FULL):
+        enemy = 'black' if color == 'white' else 'white'
+        enemy_occ = self.occ[enemy]
+        occupied = self.occ['white'] | self.occ['black']
+        # the king is taken off the board so it cannot hide behind itself on a slider's ray
+        occupied ^= BIT[ksq]
+        for to in iter_bits(KING_ATTACKS[ksq] & ~self.occ[color] & mask):
+            if not self.is_square_attacked(to, enemy, occupied):
+                moves.append(ksq | (to << 6) | (CAPTURE_BITS if BIT[to] & enemy_occ else 0))
+
+    def add_evasions(self, color, moves, mask, ksq, checkers, pins):
+        self.add_king_moves(color, moves, ksq, mask)
+        if checkers & (checkers - 1):
+            return
+        checker = lsb(checkers)
+        self.add_piece_moves(color, moves, mask & (checkers | BETWEEN[ksq][checker]), ksq, checkers, pins)
+
+    # fills buf (a reusable array('H') or list, or a new array) with encoded legal moves: pinned
+    # pieces are held to their pin line and positions in check take the evasion path.
+    # captures_only never generates quiet moves and quiets_only never generates captures.
+    # Promotions appear once per piece.
+    def generate_moves(self, buf=None, for_color=None, captures_only=False, quiets_only=False):
+        if buf is None:
+            buf = array('H')
+        else:
+            del buf[:]
+        color = for_color if for_color is not None else ('white' if self.white_to_move else 'black')
+        ksq, checkers, pins = self.check_info(color)
+        if ksq is None:
+            return buf
+        enemy_occ = self.occ['black' if color == 'white' else 'white']
+        mask = enemy_occ if captures_only else FULL ^ enemy_occ if quiets_only else FULL
+        if checkers:
+            self.add_evasions(color, buf, mask, ksq, checkers, pins)
+            return buf
+        self.add_king_moves(color, buf, ksq, mask)
+        if not captures_only:
+            for to in self.castling_targets(color):
+                buf.append(ksq | (to << 6) | ((KING_CASTLE if to > ksq else QUEEN_CASTLE) << 12))
+        self.add_piece_moves(color, buf, mask, ksq, checkers, pins)
+        return buf
+
+    # material taken by a capture; en passant takes a pawn from an empty target square
+    def captured_value(self, move):
+        if move_flags(move) == EN_PASSANT:
+            return PIECE_VALUE['p']
+        return PIECE_VALUE[self.squares[move_to(move)].lower()]
+
+    # most valuable victim first, least valuable attacker breaking ties
+    def mvv_lva(self, move):
+        return 100 * self.captured_value(move) - min(PIECE_VALUE[self.squares[move_from(move)].lower()], 99)
+
+    # material balance of the exchange a move starts on its target square, in pawns: both
+    # sides keep recapturing with their least valuable attacker, sliders behind a piece
+    # join in once it has gone, and either side may stop when going on would lose. Nothing
+    # is played on the board; pins are ignored. A quiet move scores what it loses if the
+    # piece can be taken.
+    def see(self, move):
+        frm, to, flags = decode_move(move)
+        piece = self.squares[frm]
+        occupied = (self.occ['white'] | self.occ['black']) ^ BIT[frm]
+        if flags == EN_PASSANT:
+            occupied ^= BIT[to - 8 if piece == 'P' else to + 8]
+            gain = [PIECE_VALUE['p']]
+        else:
+            gain = [PIECE_VALUE[self.squares[to].lower()] if self.squares[to] is not None else 0]
+        on_square = PIECE_VALUE[piece.lower()]
+        if flags & PROMOTION:
+            on_square = PIECE_VALUE[PROMOTION_PIECES[flags & 3]]
+            gain[0] += on_square - PIECE_VALUE['p']
+        white = not piece.isupper()
+        while True:
+            letters = WHITE_PIECES if white else BLACK_PIECES
+            attackers = self.attackers_to(to, 'white' if white else 'black', occupied) & occupied
+            if not attackers:
+                break
+            for letter in letters:
+                bb = attackers & self.pieces[letter]
+                if bb:
+                    break
+            # taking cannot help when both this capture and standing pat lose for the taker
+            if max(-gain[-1], on_square - gain[-1]) < 0:
+                break
+            gain.append(on_square - gain[-1])
+            on_square = PIECE_VALUE[letter.lower()]
+            occupied ^= bb & -bb
+            white = not white
+        while len(gain) > 1:
+            last = gain.pop()
+            gain[-1] = -max(-gain[-1], last)
+        return gain[0]
+
+    # a capture that loses material once the exchange is played out; the cheap victim
+    # against attacker test settles most captures without a SEE
+    def is_losing_capture(self, move):
+        attacker = self.squares[move_from(move)].lower()
+        return self.captured_value(move) < PIECE_VALUE[attacker] and self.see(move) < 0
+
+    # yields the side's legal moves lazily, one stage at a time: the hash move, captures
+    # that don't lose material (by SEE) in MVV-LVA order, killers, quiets by history, then
+    # the losing captures.
+    # Nothing is generated for a stage until the previous one is used up, so a cutoff on
+    # the hash move or a capture never pays for quiet-move generation. The position must
+    # be unchanged whenever the caller resumes the generator.
+    def staged_moves(self, tt_move=0, killers=(), history=None, for_color=None, capture_buf=None, quiet_buf=None):
+        color = for_color if for_color is not None else ('white' if self.white_to_move else 'black')
+        own = self.occ[color]
+        if tt_move and BIT[move_from(tt_move)] & own and self.is_legal(tt_move):
+            yield tt_move
+        else:
+            tt_move = 0
+        losing = []
+        # the stage buffers are lists so they can be ordered in place and reused
+        captures = self.generate_moves(capture_buf if capture_buf is not None else [], color, captures_only=True)
+        captures.sort(key=self.mvv_lva, reverse=True)
+        for m in captures:
+            if m == tt_move: continue
+            if self.is_losing_capture(m):
+                losing.append(m)
+                continue
+            yield m
+        tried = [tt_move]
+        for k in killers:
+            if k and k not in tried and not k & CAPTURE_BITS and BIT[move_from(k)] & own and self.is_legal(k):
+                tried.append(k)
+                yield k
+        quiets = self.generate_moves(quiet_buf if quiet_buf is not None else [], color, quiets_only=True)
+        if history is not None:
+            quiets.sort(key=lambda m: history[m & 0xFFF], reverse=True)
+        for m in quiets:
+            if m not in tried:
+                yield m
+        yield from losing
+
+    # legal moves as (r, c, nr, nc) tuples for the GUI; a promotion is listed once
+    def generate_legal_moves(self, for_color=None):
+        return [move_to_tuple(m) for m in self.generate_moves(None, for_color)
+                if promotion_piece(m) in (None, 'q')]
+
+    # encodes (r, c, nr, nc) against the current position, working out the flags from the
+    # pieces involved; promotions default to a queen. The result is not checked for legality.
+    def encode_move(self, r, c, nr, nc, promotion_choice=None):
+        frm, to = r*8 + c, nr*8 + nc
+        piece = self.squares[frm]
+        if piece is None: return None
+        flags = CAPTURE if self.squares[to] is not None else QUIET
+        if piece in ('P', 'p'):
+            if self.en_passant == (nr, nc) and c != nc:
+                flags = EN_PASSANT
+            elif abs(to - frm) == 16:
+                flags = DOUBLE_PUSH
+            elif nr in (0, 7):
+                promo = (promotion_choice or 'q').lower()
+                if promo not in PROMOTION_PIECES: return None
+                flags |= PROMOTION | PROMOTION_PIECES.index(promo)
+        elif piece in ('K', 'k') and abs(nc - c) == 2:
+            flags = KING_CASTLE if nc > c else QUEEN_CASTLE
+        return pack_move(frm, to, flags)
+
+    # legality of one encoded move, looking only at the moving piece: its reach, then
+    # whether the king would be attacked once the move is on the board
+    def is_legal(self, move):
+        frm, to, flags = decode_move(move)
+        piece = self.squares[frm]
+        if piece is None: return False
+        if move != self.encode_move(frm >> 3, frm & 7, to >> 3, to & 7, promotion_piece(move)):
+            return False
+        color = 'white' if piece.isupper() else 'black'
+        enemy = 'black' if color == 'white' else 'white'
+        if flags in (KING_CASTLE, QUEEN_CASTLE):
+            return to in self.castling_targets(color)
+        if not self.pseudo_targets(frm, piece) & BIT[to]:
+            return False
+        ksq = self.king_square[color]
+        if ksq is None: return False
+        occupied = self.occ['white'] | self.occ['black']
+        if frm == ksq:
+            return not self.is_square_attacked(to, enemy, occupied ^ BIT[frm])
+        if flags == EN_PASSANT:
+            return self.en_passant_is_legal(frm, to, color, ksq, self.attackers_to(ksq, enemy, occupied))
+        # a captured piece sits on `to`, so anything found there no longer attacks
+        return not self.attackers_to(ksq, enemy, (occupied ^ BIT[frm]) | BIT[to]) & ~BIT[to]
+
+    # number of legal moves, counted from the target sets without building a move list;
+    # with stop_at it returns as soon as that many are found. Non-king pieces are counted
+    # first since they need no attack test per target.
+    def count_legal_moves(self, for_color=None, stop_at=None):
+        color = for_color if for_color is not None else ('white' if self.white_to_move else 'black')
+        ksq, checkers, pins = self.check_info(color)
+        if ksq is None:
+            return 0
+        white = color == 'white'
+        enemy = 'black' if white else 'white'
+        count = 0
+        if not checkers & (checkers - 1):
+            mask = checkers | BETWEEN[ksq][lsb(checkers)] if checkers else FULL
+            ep = self.en_passant
+            ep_bb = BIT[ep[0]*8 + ep[1]] if ep else 0
+            pawn = 'P' if white else 'p'
+            last_rank = RANK_8 if white else RANK_1
+            for sq in iter_bits(self.occ[color] ^ BIT[ksq]):
+                piece = self.squares[sq]
+                targets = self.pseudo_targets(sq, piece) & pins.get(sq, FULL)
+                if piece == pawn:
+                    if targets & ep_bb:
+                        targets ^= ep_bb
+                        if self.en_passant_is_legal(sq, lsb(ep_bb), color, ksq, checkers):
+                            count += 1
+                    # each promotion square is four moves
+                    count += 3 * popcount(targets & mask & last_rank)
+                count += popcount(targets & mask)
+                if stop_at and count >= stop_at:
+                    return count
+            if not checkers:
+                count += len(self.castling_targets(color))
+        occupied = (self.occ['white'] | self.occ['black']) ^ BIT[ksq]
+        for to in iter_bits(KING_ATTACKS[ksq] & ~self.occ[color]):
+            if not self.is_square_attacked(to, enemy, occupied):
+                count += 1
+                if stop_at and count >= stop_at:
+                    return count
+        return count
+
+    def has_legal_move(self, for_color=None):
+        return self.count_legal_moves(for_color, stop_at=1) > 0
+
+    def is_checkmate(self, for_color=None):
+        color = for_color if for_color is not None else ('white' if self.white_to_move else 'black')
+        return self.is_in_check(color) and not self.has_legal_move(color)
+
+    def is_stalemate(self, for_color=None):
+        color = for_color if for_color is not None else ('white' if self.white_to_move else 'black')
+        return not self.is_in_check(color) and not self.has_legal_move(color)
+
+    # earlier occurrences of the current position. Each undo record holds the hash from
+    # before its move, so the record k plies back is the position k plies ago; only the
+    # same side to move can match, and nothing before the last capture or pawn move can
+    # repeat. Search passes stop_at=1 to treat any repetition as a draw.
+    def repetition_count(self, stop_at=None):
+        history = self.move_history
+        count = 0
+        for k in range(4, min(self.halfmove_clock, len(history)) + 1, 2):
+            if history[-k][7] == self.hash:
+                count += 1
+                if stop_at and count >= stop_at:
+                    break
+        return count
+
+    def is_threefold_repetition(self):
+        return self.repetition_count(stop_at=2) >= 2
+
+    def is_fifty_move_draw(self):
+        return self.halfmove_clock >= 100
+
+    # neither side can mate: bare kings, a single minor piece, or only bishops on one square colour
+    def is_insufficient_material(self):
+        p = self.pieces
+        if p['P'] | p['p'] | p['R'] | p['r'] | p['Q'] | p['q']:
+            return False
+        knights = p['N'] | p['n']
+        bishops = p['B'] | p['b']
+        if not (knights | bishops) & ((knights | bishops) - 1):
+            return True
+        return not knights and (not bishops & LIGHT_SQUARES or not bishops & DARK_SQUARES)
+
+    def is_draw(self):
+        return self.is_fifty_move_draw() or self.is_insufficient_material() or self.is_threefold_repetition()
+
+    # the legal encoded move matching squares and promotion piece (queen by default), or None
+    def find_move(self, r, c, nr, nc, promotion_choice=None):
+        move = self.encode_move(r, c, nr, nc, promotion_choice)
+        return move if move is not None and self.is_legal(move) else None
+
+    def make_move(self, r, c, nr, nc, promotion_choice=None):
+        move = self.find_move(r, c, nr, nc, promotion_choice)
+        if move is None:
+            return False
+        self.push(move)
+        return True
+
+    # for callers that already hold a legal encoded move, e.g. from generate_moves or the AI
+    def make_move_unchecked(self, move):
+        self.push(move)
         return True
 
     def undo_move(self):
         if not self.move_history:
             return False
-        last = self.move_history.pop()
-        self.board = last['board']
-        self.white_to_move = last['white_to_move']
-        self.castling = last['castling']
-        self.en_passant = last['en_passant']
-        self.halfmove_clock = last['halfmove_clock']
-        self.fullmove_number = last['fullmove_number']
+        self.pop()
         return True
 
+    def last_move(self):
+        return self.move_history[-1][0] if self.move_history else None
+
+    # leaf nodes at depth; cache maps (hash, depth) -> count to collapse transpositions
+    def perft(self, depth, cache=None, buffers=None):
+        if depth == 0:
+            return 1
+        if buffers is None:
+            buffers = [array('H') for _ in range(depth + 1)]
+        if depth == 1:
+            return self.count_legal_moves()
+        # a cache hit must not pay for move generation
+        if cache is not None:
+            key = (self.hash, depth)
+            if key in cache:
+                return cache[key]
+        moves = self.generate_moves(buffers[depth])
+        nodes = 0
+        for mv in moves:
+            self.push(mv)
+            nodes += self.perft(depth - 1, cache, buffers)
+            self.pop()
+        if cache is not None:
+            cache[key] = nodes
+        return nodes
+
+    # perft split by root move, keyed by the move in UCI notation
+    def divide(self, depth, cache=None):
+        counts = {}
+        for mv in self.generate_moves():
+            self.push(mv)
+            counts[move_to_uci(mv)] = self.perft(depth - 1, cache)
+            self.pop()
+        return counts
+
+    def load_fen(self, fen):
+        fields = fen.split()
+        b = [[None for _ in range(8)] for _ in range(8)]
+        for i, row in enumerate(fields[0].split('/')):
+            c = 0
+            for ch in row:
+                if ch.isdigit():
+                    c += int(ch)
+                else:
+                    b[7 - i][c] = ch
+                    c += 1
+        self.board = b
+        self.white_to_move = fields[1] == 'w'
+        self.castling = [x in fields[2] for x in 'KQkq']
+        ep = fields[3] if len(fields) > 3 else '-'
+        self.en_passant = None if ep == '-' else (int(ep[1]) - 1, FILES.index(ep[0]))
+        self.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+        self.fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        self.move_history = []
+        self.hash = self.compute_hash()
+
+    def to_fen(self):
+        rows = []
+        for r in range(7, -1, -1):
+            row, empty = '', 0
+            for p in self.squares[r*8:r*8+8]:
+                if p is None:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty); empty = 0
+                row += p
+            rows.append(row + (str(empty) if empty else ''))
+        castling = ''.join(x for x, ok in zip('KQkq', self.castling) if ok) or '-'
+        ep = f"{FILES[self.en_passant[1]]}{self.en_passant[0]+1}" if self.en_passant else '-'
+        return (f"{'/'.join(rows)} {'w' if self.white_to_move else 'b'} {castling} {ep} "
+                f"{self.halfmove_clock} {self.fullmove_number}")
+
     def to_json(self):
         data = {
             'board': self.board,
@@ -341,6 +852,10 @@ class GameState:
         self.white_to_move = data['white_to_move']
         self.castling = data['castling']
         self.en_passant = tuple(data['en_passant']) if data.get('en_passant') is not None else None
-        self.move_history = data.get('move_history', [])
+        # JSON turns the records' tuples into lists; histories saved as full board
+        # snapshots (dicts) predate undo records and cannot be replayed, so they are dropped
+        self.move_history = [tuple(rec[:4]) + (tuple(rec[4]) if rec[4] else None,) + tuple(rec[5:])
+                             for rec in data.get('move_history', []) if not isinstance(rec, dict)]
         self.halfmove_clock = data.get('halfmove_clock', 0)
         self.fullmove_number = data.get('fullmove_number', 1)
+        self.hash = self.compute_hash()
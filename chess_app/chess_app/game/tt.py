@@ -0,0 +1,94 @@
+from array import array
+from multiprocessing import shared_memory
+
+# bound types: the stored score is exact, a lower bound (fail high) or an upper bound (fail low)
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# one 64-bit key word and one packed 64-bit data word per entry; the top 16 bits of the
+# data word hold the encoded best move. The key word is stored xored with the data word,
+# so an entry whose two words come from different writes fails the key check
+ENTRY_BYTES = 16
+# scores are kept as signed fixed-point integers in the data word
+SCORE_SCALE = 100
+
+
+class TranspositionTable:
+    # each bucket holds two entries: slot 0 keeps the deepest result (or anything from an
+    # older search), slot 1 always takes the newest one
+    def __init__(self, size_mb=16):
+        self.resize(size_mb)
+
+    def resize(self, size_mb):
+        self.size_mb = size_mb
+        self.buckets = max(1, int(size_mb * 1024 * 1024) // (2 * ENTRY_BYTES))
+        self.keys = array('Q', bytes(16 * self.buckets))
+        self.data = array('Q', bytes(16 * self.buckets))
+        self.generation = 0
+
+    def clear(self):
+        self.resize(self.size_mb)
+
+    # called once per search so stale deep entries stop blocking slot 0
+    def new_search(self):
+        self.generation = (self.generation + 1) & 0x3F
+
+    def probe(self, key):
+        i = (key % self.buckets) << 1
+        keys, data = self.keys, self.data
+        d = data[i]
+        if keys[i] ^ d != key:
+            i += 1
+            d = data[i]
+            if keys[i] ^ d != key:
+                return None
+        score = ((d & 0xFFFFFFFF) - 0x80000000) / SCORE_SCALE
+        return (d >> 32) & 0xFF, score, (d >> 40) & 3, (d >> 48) or None
+
+    def store(self, key, depth, score, flag, move):
+        i = (key % self.buckets) << 1
+        old = self.data[i]
+        if self.keys[i] ^ old != key and depth < (old >> 32) & 0xFF and (old >> 42) & 0x3F == self.generation:
+            i += 1
+        d = ((int(round(score * SCORE_SCALE)) + 0x80000000) | (min(depth, 255) << 32) | (flag << 40)
+             | (self.generation << 42) | ((move or 0) << 48))
+        self.keys[i] = key ^ d
+        self.data[i] = d
+
+
+class SharedTranspositionTable(TranspositionTable):
+    # the same table in a multiprocessing.shared_memory block, so several search processes
+    # can use one. With no name a new block is created (and freed again by close);
+    # otherwise the named block of an existing table of the same size is attached. Entries
+    # are read and written without locks and the xored key word catches torn writes.
+    def __init__(self, size_mb=16, name=None):
+        self.owner = name is None
+        self.shm = None
+        self.name = name
+        super().__init__(size_mb)
+
+    def resize(self, size_mb):
+        self.close()
+        self.size_mb = size_mb
+        self.buckets = max(1, int(size_mb * 1024 * 1024) // (2 * ENTRY_BYTES))
+        self.shm = shared_memory.SharedMemory(self.name, create=self.owner, size=32 * self.buckets)
+        self.name = self.shm.name
+        self.words = self.shm.buf.cast('Q')
+        self.keys = self.words[:2 * self.buckets]
+        self.data = self.words[2 * self.buckets:4 * self.buckets]
+        self.generation = 0
+
+    def clear(self):
+        self.shm.buf[:32 * self.buckets] = bytes(32 * self.buckets)
+        self.generation = 0
+
+    def close(self):
+        if self.shm is None:
+            return
+        # the views must go before the block can be closed
+        for view in (self.keys, self.data, self.words):
+            view.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+            self.name = None
+        self.shm = None
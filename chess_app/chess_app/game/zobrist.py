@@ -0,0 +1,9 @@
+import random
+
+# fixed seed so a position hashes to the same key in every process and every run
+_rng = random.Random(0x5EED)
+
+PIECE_KEYS = {p: [_rng.getrandbits(64) for _ in range(64)] for p in 'PNBRQKpnbrqk'}
+SIDE_KEY = _rng.getrandbits(64)  # xored in when black is to move
+CASTLING_KEYS = [_rng.getrandbits(64) for _ in range(4)]
+EN_PASSANT_KEYS = [_rng.getrandbits(64) for _ in range(8)]
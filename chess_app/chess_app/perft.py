@@ -0,0 +1,85 @@
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .game.state import GameState
+from .game.move import move_to_uci
+
+# standard perft positions with their published node counts, depth 1 first
+POSITIONS = [
+    ('startpos', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+     [20, 400, 8902, 197281, 4865609]),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     [48, 2039, 97862, 4085603]),
+    ('position3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+     [14, 191, 2812, 43238, 674624]),
+    ('position4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     [6, 264, 9467, 422333]),
+    ('position5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+     [44, 1486, 62379, 2103487]),
+    ('position6', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+     [46, 2079, 89890, 3894594]),
+]
+
+
+def perft_fen(fen, depth, use_cache=False):
+    gs = GameState()
+    gs.load_fen(fen)
+    return gs.perft(depth, {} if use_cache else None)
+
+
+# divide() with the root moves farmed out to a process pool
+def parallel_divide(gs, depth, workers, use_cache=False):
+    jobs = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for mv in gs.generate_moves():
+            gs.push(mv)
+            jobs[move_to_uci(mv)] = pool.submit(perft_fen, gs.to_fen(), depth - 1, use_cache)
+            gs.pop()
+        return {mv: job.result() for mv, job in jobs.items()}
+
+
+def run(fen, depth, workers=1, use_cache=False, divide=False):
+    gs = GameState()
+    gs.load_fen(fen)
+    start = time.perf_counter()
+    if workers > 1 and depth > 1:
+        counts = parallel_divide(gs, depth, workers, use_cache)
+    elif divide:
+        counts = gs.divide(depth, {} if use_cache else None)
+    else:
+        counts = {'': gs.perft(depth, {} if use_cache else None)}
+    elapsed = time.perf_counter() - start
+    if divide:
+        for mv in sorted(counts):
+            print(f"  {mv}: {counts[mv]}")
+    return sum(counts.values()), elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Count move-generation leaf nodes (perft).')
+    parser.add_argument('--depth', type=int, help='depth for every position (default: deepest known count, capped at 3)')
+    parser.add_argument('--fen', help='run a single position instead of the standard suite')
+    parser.add_argument('--divide', action='store_true', help='print the node count under each root move')
+    parser.add_argument('--hash', action='store_true', help='cache subtree counts by position hash')
+    parser.add_argument('--workers', type=int, default=1, help='split root moves across this many processes')
+    args = parser.parse_args(argv)
+
+    positions = [('fen', args.fen, [])] if args.fen else POSITIONS
+    failed = False
+    for name, fen, expected in positions:
+        depth = args.depth or min(len(expected), 3) or 1
+        nodes, elapsed = run(fen, depth, args.workers, args.hash, args.divide)
+        status = ''
+        if depth <= len(expected):
+            ok = nodes == expected[depth - 1]
+            failed |= not ok
+            status = 'ok' if ok else f'FAIL (expected {expected[depth - 1]})'
+        nps = nodes / elapsed if elapsed else 0
+        print(f"{name:10} depth {depth}  nodes {nodes:>10}  {elapsed:7.2f}s  {nps:>9.0f} nps  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,9 @@
 import tkinter as tk
 from tkinter import messagebox, simpledialog, filedialog
-from copy import deepcopy
 
 from game.state import GameState
 from game.ai import ai_choose_move
+from game.move import move_to_tuple
 from game.utils import PIECE_UNICODE
 
 class ChessGUI:
@@ -182,8 +182,8 @@ class ChessGUI:
             return
         self.draw_board()
         self.check_post_move()
-        last_move = self.state.move_history[-1]['move']
-        self.move_listbox.insert(tk.END, f"{len(self.state.move_history)}. {last_move}")
+        lr, lc, lnr, lnc = move_to_tuple(self.state.last_move())
+        self.move_listbox.insert(tk.END, f"{len(self.state.move_history)}. {lr},{lc}->{lnr},{lnc}")
         self.move_listbox.yview(tk.END)
 
         if self.ai_enabled and ((self.ai_side == 'white' and self.state.white_to_move) or (self.ai_side == 'black' and not self.state.white_to_move)):
@@ -283,23 +283,16 @@ class ChessGUI:
         if mv is None:
             self.check_post_move(force_check_current=True)
             return
-        r,c,nr,nc = mv
-        promo = None
-        moving = self.state.board[r][c]
-        if moving and moving.lower() == 'p':
-            if moving.isupper() and nr == 7: promo = 'Q'
-            if moving.islower() and nr == 0: promo = 'q'
-        self.state.make_move(r,c,nr,nc,promotion_choice=promo)
+        self.state.make_move_unchecked(mv)
         self.draw_board()
         self.check_post_move()
         return
 
     def check_post_move(self, force_check_current=False):
         side_to_move = 'white' if self.state.white_to_move else 'black'
-        legal_moves = self.state.generate_legal_moves(side_to_move)
         in_check = self.state.is_in_check(side_to_move)
 
-        if not legal_moves:
+        if not self.state.has_legal_move(side_to_move):
             if in_check:
                 winner = "White" if side_to_move == "black" else "Black"
                 messagebox.showinfo("Game Over", f"Checkmate! {winner} wins!")
@@ -310,6 +303,15 @@ class ChessGUI:
             self.update_status()
             return
 
+        draw = ("threefold repetition" if self.state.is_threefold_repetition() else
+                "the fifty-move rule" if self.state.is_fifty_move_draw() else
+                "insufficient material" if self.state.is_insufficient_material() else None)
+        if draw:
+            messagebox.showinfo("Game Over", f"Draw by {draw}.")
+            self.game_over = f"Draw by {draw}"
+            self.update_status()
+            return
+
         if in_check:
             messagebox.showinfo("Check", f"{side_to_move.capitalize()} is in check!")
 